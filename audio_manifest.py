@@ -0,0 +1,137 @@
+import json
+import os
+import re
+import threading
+import time
+
+AUDIO_EXTENSIONS = ('.wav',)
+# Variants written by optimize_audio.py: <name>.<10 hex content hash>.wav, indexed in optimized.json
+OPTIMIZED_NAME = re.compile(r"\.[0-9a-f]{10}\.wav$")
+OPTIMIZED_INDEX = 'optimized.json'
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def phrase_key(text):
+    """Key shared by English phrases and audio filenames: "Okay, you can get them" == "okay_you_can_get_them"."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+class AudioManifest:
+    """Map of English phrase key -> recording, scanned from the audio dataset folder.
+
+    Category folders are discovered rather than hard-coded. After the first scan only
+    folders whose mtime changed (files added, removed or renamed) are listed again, and
+    the folders are stat()ed at most once every refresh_interval seconds, so resolving
+    a phrase to its audio is a dict lookup instead of filesystem probing. Recordings with
+    an optimized variant (see optimize_audio.py) resolve to the variant.
+    """
+
+    def __init__(self, root, url_prefix='/audio', refresh_interval=5.0):
+        self.root = root
+        self.url_prefix = url_prefix
+        self.refresh_interval = refresh_interval
+        self.version = 0  # bumped whenever a refresh changes the manifest
+        self._folders = {}  # folder -> (mtime_ns, {key: filename})
+        self._entries = {}  # key -> (folder, filename)
+        self._optimized = (None, {})  # (mtime_ns of optimized.json, {"Folder/original.wav": "Folder/variant.wav"})
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _scan_folder(self, folder):
+        files = {}
+        with os.scandir(os.path.join(self.root, folder)) as it:
+            names = sorted(e.name for e in it if e.is_file() and e.name.lower().endswith(AUDIO_EXTENSIONS))
+        for name in names:
+            if OPTIMIZED_NAME.search(name):
+                continue
+            # Sorted so "good to see you.wav" wins over "good_to_see_you.wav", as before
+            files.setdefault(phrase_key(os.path.splitext(name)[0]), name)
+        return files
+
+    def _load_optimized(self):
+        """Reload optimized.json if it changed, keeping only variants that exist on disk."""
+        path = os.path.join(self.root, OPTIMIZED_INDEX)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._optimized[0]:
+            return False
+        variants = {}
+        if mtime is not None:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    index = json.load(f)
+            except ValueError:
+                index = {}
+            for original, entry in index.items():
+                if os.path.exists(os.path.join(self.root, entry['file'])):
+                    variants[original] = entry['file']
+        self._optimized = (mtime, variants)
+        return True
+
+    def refresh(self, force=False):
+        """Rescan folders that changed since the last scan. Returns True if the manifest changed."""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return False
+        with self._lock:
+            self._checked_at = now
+            try:
+                with os.scandir(self.root) as it:
+                    current = {e.name: e.stat().st_mtime_ns for e in it if e.is_dir()}
+            except FileNotFoundError:
+                current = {}
+
+            folders = {}
+            changed = self._load_optimized() or set(self._folders) != set(current)
+            for folder in sorted(current):
+                mtime = current[folder]
+                previous = self._folders.get(folder)
+                if previous is not None and previous[0] == mtime:
+                    folders[folder] = previous
+                else:
+                    folders[folder] = (mtime, self._scan_folder(folder))
+                    changed = True
+            if not changed:
+                return False
+
+            entries = {}
+            for folder, (_, files) in folders.items():
+                for key, filename in files.items():
+                    entries.setdefault(key, (folder, filename))
+            self._folders = folders
+            self._entries = entries
+            self.version += 1
+            return True
+
+    def lookup(self, phrase):
+        """Return the /audio URL of the recording for an English phrase, or None."""
+        if not phrase:
+            return None
+        self.refresh()
+        entry = self._entries.get(phrase_key(phrase))
+        if entry is None:
+            return None
+        return self._url(*entry)
+
+    def _url(self, folder, filename):
+        # Prefer the optimized variant, fall back to the original recording
+        path = f"{folder}/{filename}"
+        return f"{self.url_prefix}/{self._optimized[1].get(path, path)}"
+
+    def entries(self):
+        """Return {phrase key: url} for every recording."""
+        self.refresh()
+        return {key: self._url(folder, filename) for key, (folder, filename) in self._entries.items()}
+
+    def check(self, translations):
+        """Compare the manifest with the lexicon.
+        Returns: (English phrases without a recording, recordings that match no phrase)
+        """
+        self.refresh()
+        keys = {phrase_key(english) for english in translations}
+        missing = [english for english in translations if phrase_key(english) not in self._entries]
+        orphans = [f"{folder}/{filename}" for key, (folder, filename) in self._entries.items() if key not in keys]
+        return missing, orphans
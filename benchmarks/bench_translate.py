@@ -0,0 +1,168 @@
+"""Micro-benchmarks for the translate() hot path over growing synthetic lexicons.
+
+Times each matching branch of Bot.translate (exact, substring, fuzzy, no-match guide)
+with the result cache disabled, plus cached repeats, Bot._normalize, the audio lookup
+used by /chat and the lexicon load itself. Prints one JSON document:
+
+    python -m benchmarks.bench_translate --sizes 100 1000 10000 100000 > bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from bot import Bot
+from benchmarks.synthetic_lexicon import synthetic_bot
+
+
+def summarize(samples_ns):
+    """Latency summary in microseconds for a list of per-call durations in nanoseconds."""
+    samples = sorted(samples_ns)
+    count = len(samples)
+
+    def pct(p):
+        return round(samples[min(count - 1, int(p / 100 * count))] / 1000, 2)
+
+    total = sum(samples)
+    return {
+        'calls': count,
+        'mean_us': round(total / count / 1000, 2),
+        'p50_us': pct(50),
+        'p95_us': pct(95),
+        'p99_us': pct(99),
+        'max_us': round(samples[-1] / 1000, 2),
+        'ops_per_s': round(count / (total / 1e9), 1) if total else None,
+    }
+
+
+def time_calls(func, inputs, repeat):
+    samples = []
+    for _ in range(repeat):
+        for value in inputs:
+            start = time.perf_counter_ns()
+            func(value)
+            samples.append(time.perf_counter_ns() - start)
+    return summarize(samples)
+
+
+def branch_inputs(bot, rng, count):
+    """Inputs that exercise each branch of translate(), checked against the bot itself."""
+    lexicon = bot.lexicon.get()
+    english = list(lexicon.translations)
+    picks = [rng.choice(english) for _ in range(count * 4)]
+
+    exact = picks[:count]
+    substring = [f"please say {p.lower()} now" for p in picks[count:2 * count]]
+    fuzzy = []
+    for p in picks[2 * count:]:
+        # One substituted character in the middle of a phrase long enough to survive it
+        norm = bot._normalize(p)
+        if len(norm) < 6:
+            continue
+        i = len(norm) // 2
+        typo = norm[:i] + ("x" if norm[i] != "x" else "q") + norm[i + 1:]
+        if typo not in lexicon.phrase_to_english:
+            fuzzy.append(typo)
+        if len(fuzzy) == count:
+            break
+    none = [f"zzqx {i} vvqq" for i in range(count)]
+
+    inputs = {'exact': exact, 'substring': substring, 'fuzzy': fuzzy, 'no_match': none}
+    # Keep only inputs that really take their branch, so one branch can't hide in another
+    for branch, values in inputs.items():
+        inputs[branch] = [v for v in values if _branch(bot, v) == branch]
+    return inputs
+
+
+def _branch(bot, userinput):
+    norm = bot._normalize(userinput)
+    branch = bot._translate_normalized(norm, bot.lexicon.get())[3]
+    return 'no_match' if branch == 'none' else branch
+
+
+def bench_lexicon(size, directory, count, repeat, seed):
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    bot = synthetic_bot(size, directory, seed=seed)
+    load_s = time.perf_counter() - start
+
+    # Time a reload from the compiled file alone (no JSON parse / normalization)
+    bot.lexicon._lexicon = None
+    start = time.perf_counter()
+    bot.lexicon.get()
+    reload_s = time.perf_counter() - start
+
+    inputs = branch_inputs(bot, rng, count)
+    bot.cache.maxsize = 0  # measure the matching itself, not the cache
+    result = {
+        'entries': size,
+        'phrases': len(bot.lexicon.get().corpus),
+        'build_and_load_s': round(load_s, 3),
+        'load_compiled_s': round(reload_s, 3),
+        'branches': {},
+    }
+    for branch, values in inputs.items():
+        if values:
+            result['branches'][branch] = time_calls(bot.translate, values, repeat)
+
+    bot.cache.maxsize = 1024
+    bot.cache.clear()
+    repeated = inputs['exact'][:20]
+    for value in repeated:
+        bot.translate(value)
+    result['branches']['cached'] = time_calls(bot.translate, repeated, repeat)
+    bot.metrics.close()
+    return result
+
+
+def bench_fixed(count, repeat):
+    """Benchmarks that don't depend on lexicon size: normalization and audio lookup."""
+    bot = Bot()
+    phrases = list(bot.translations)
+    messages = [
+        "What is good morning?", "Ano ang pula", "paki translate thank you please",
+        "Can you translate 'The garden is by the river'?", "Améng", "kahulugan ng asawa a lalaki",
+    ]
+    audio = bot.audio
+    audio.refresh(force=True)
+    return {
+        'normalize': time_calls(bot._normalize, messages * max(1, count // len(messages)), repeat),
+        'audio_lookup_hit': time_calls(audio.lookup, phrases, repeat),
+        'audio_lookup_miss': time_calls(audio.lookup, [p + " zz" for p in phrases], repeat),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--count', type=int, default=200, help='distinct inputs per branch')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the inputs')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = {
+        'benchmark': 'translate',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'fixed': bench_fixed(args.count, args.repeat),
+        'lexicons': [],
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            report['lexicons'].append(bench_lexicon(size, directory, args.count, args.repeat, args.seed))
+            for name in os.listdir(directory):
+                os.unlink(os.path.join(directory, name))
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report['max_rss_mb'] = round(maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == '__main__':
+    main()
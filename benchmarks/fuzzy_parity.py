@@ -0,0 +1,106 @@
+"""Randomized check that FuzzyIndex.search ranks exactly as difflib.get_close_matches.
+
+Mutates phrases of the corpus with a few random edits (substitutions, insertions,
+deletions, transpositions), plus some truncations and random letters, and compares both
+answers for every input. Prints a JSON summary, including search() latency, and exits
+non-zero on any mismatch. Runs against the real lexicon, or a synthetic one with --size
+(large enough ones exceed FuzzyIndex's budgets, where results are no longer exact):
+
+    python -m benchmarks.fuzzy_parity --inputs 20000 --seed 1
+"""
+import argparse
+import difflib
+import json
+import random
+import string
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_translate import summarize
+from benchmarks.synthetic_lexicon import isolate, synthetic_bot
+from bot import Bot
+
+LETTERS = string.ascii_lowercase + " "
+
+
+def mutate(rng, text):
+    """text with one to three random edits."""
+    chars = list(text)
+    for _ in range(rng.randint(1, 3)):
+        op = rng.choice(('substitute', 'insert', 'delete', 'transpose'))
+        i = rng.randrange(len(chars) + 1)
+        if op == 'insert' or not chars:
+            chars.insert(i, rng.choice(LETTERS))
+        elif op == 'substitute':
+            chars[min(i, len(chars) - 1)] = rng.choice(LETTERS)
+        elif op == 'delete':
+            del chars[min(i, len(chars) - 1)]
+        elif len(chars) > 1:
+            i = min(i, len(chars) - 2)
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars).strip()
+
+
+def inputs(rng, corpus, count):
+    values = []
+    while len(values) < count:
+        roll = rng.random()
+        phrase = rng.choice(corpus)
+        if roll < 0.8:
+            value = mutate(rng, phrase)
+        elif roll < 0.9:
+            value = phrase[:rng.randint(1, len(phrase))]
+        else:
+            value = "".join(rng.choice(LETTERS) for _ in range(rng.randint(1, 12))).strip()
+        if value:
+            values.append(value)
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=0, help='synthetic lexicon entries (0 = real lexicon)')
+    parser.add_argument('--inputs', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.size:
+            bot = synthetic_bot(args.size, directory, seed=args.seed)
+        else:
+            bot = isolate(Bot(), directory)
+        lexicon = bot.lexicon.get()
+        bot.metrics.close()
+    index = lexicon.fuzzy_index
+    corpus = lexicon.corpus
+
+    values = inputs(rng, corpus, args.inputs)
+    mismatches = []
+    top_mismatches = 0
+    samples = []
+    for value in values:
+        start = time.perf_counter_ns()
+        got = index.search(value, n=5)
+        samples.append(time.perf_counter_ns() - start)
+        expected = difflib.get_close_matches(value, corpus, n=5, cutoff=index.cutoff)
+        if got != expected:
+            top_mismatches += got[:1] != expected[:1]
+            mismatches.append({'input': value, 'search': got, 'get_close_matches': expected})
+
+    json.dump({
+        'benchmark': 'fuzzy_parity',
+        'phrases': len(corpus),
+        'inputs': len(values),
+        'mismatches': len(mismatches),
+        'top_match_mismatches': top_mismatches,
+        'examples': mismatches[:10],
+        'search': summarize(samples),
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
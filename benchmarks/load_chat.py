@@ -0,0 +1,110 @@
+"""Concurrent load driver for /chat through the Flask test client.
+
+Sends a mix of exact, substring, fuzzy and unknown messages from several threads and
+prints throughput and latency percentiles as JSON. Runs against the real lexicon, or a
+synthetic one with --size:
+
+    python -m benchmarks.load_chat --requests 5000 --concurrency 8 --size 10000
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import chatbot_api
+from benchmarks.bench_translate import branch_inputs, summarize
+from benchmarks.synthetic_lexicon import isolate, synthetic_bot
+
+
+def run_load(app, messages, total, concurrency, endpoint='/chat'):
+    """POST total messages (cycled from messages) from concurrency threads."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        client = app.test_client()
+        local = []
+        failed = 0
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                break
+            message = messages[i % len(messages)]
+            start = time.perf_counter_ns()
+            response = client.post(endpoint, json={'message': message})
+            local.append(time.perf_counter_ns() - start)
+            if response.status_code != 200:
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = summarize(latencies)
+    result.update({
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1),
+        'errors': sum(errors),
+    })
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=0, help='synthetic lexicon entries (0 = real lexicon)')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--distinct', type=int, default=100, help='distinct messages per branch')
+    parser.add_argument('--no-cache', action='store_true', help='disable the translate() result cache')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.size:
+            chatbot_api.translator_bot = synthetic_bot(args.size, directory, seed=args.seed)
+        else:
+            isolate(chatbot_api.translator_bot, directory)
+        bot = chatbot_api.translator_bot
+        if args.no_cache:
+            bot.cache.maxsize = 0
+
+        inputs = branch_inputs(bot, random.Random(args.seed), args.distinct)
+        messages = [m for values in inputs.values() for m in values]
+        random.Random(args.seed).shuffle(messages)
+
+        report = {
+            'benchmark': 'load_chat',
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'lexicon_entries': len(bot.translations),
+            'messages': {branch: len(values) for branch, values in inputs.items()},
+            'cache': not args.no_cache,
+            'runs': [],
+        }
+        for concurrency in args.concurrency:
+            bot.cache.clear()
+            report['runs'].append(run_load(chatbot_api.app, messages, args.requests, concurrency))
+        report['cache_stats'] = bot.cache.stats()
+        bot.metrics.close()
+
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Synthetic lexicons for benchmarking: the shape of lexicon.json, any number of entries.
+
+Words are built from Tagalog/Agta-like syllables so trigram and automaton statistics
+look like the real data rather than random letters.
+"""
+import json
+import os
+import random
+
+from bot import Bot
+from metrics import Metrics
+
+SYLLABLES = [
+    "a", "e", "i", "o", "u", "ka", "ma", "na", "ta", "sa", "la", "ba", "ga", "da", "pa",
+    "ya", "wa", "ha", "ng", "an", "in", "un", "en", "me", "ne", "te", "se", "de", "ko",
+    "lo", "mo", "no", "to", "so", "ki", "mi", "ni", "ti", "si", "li", "ku", "mu", "nu",
+]
+
+
+def _word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def _phrase(rng, words):
+    return " ".join(rng.choice(words) for _ in range(rng.choice((1, 1, 2, 2, 3, 4))))
+
+
+def generate(size, seed=0, categories=10):
+    """Return a lexicon.json-shaped dict with size distinct English entries."""
+    rng = random.Random(seed)
+    # A vocabulary that grows with the lexicon, so phrases share words like real data does
+    words = sorted({_word(rng) for _ in range(max(50, size // 2))})
+    lexicon = {f"Category {i + 1}": {} for i in range(categories)}
+    names = list(lexicon)
+    seen = set()
+    while len(seen) < size:
+        english = _phrase(rng, words).capitalize()
+        if english.lower() in seen:
+            continue
+        seen.add(english.lower())
+        lexicon[names[len(seen) % categories]][english] = {
+            "filipino": _phrase(rng, words).capitalize(),
+            "casiguran_agta": _phrase(rng, words).capitalize(),
+        }
+    return lexicon
+
+
+def synthetic_bot(size, directory, seed=0):
+    """Write a synthetic lexicon of size entries into directory and return a Bot serving it."""
+    source = os.path.join(directory, f"lexicon-{size}.json")
+    with open(source, "w", encoding="utf-8") as f:
+        json.dump(generate(size, seed), f, ensure_ascii=False)
+    bot = Bot(lexicon_path=os.path.join(directory, f"lexicon-{size}.db"), lexicon_source=source)
+    isolate(bot, directory)
+    bot.lexicon.get()
+    return bot
+
+
+def isolate(bot, directory):
+    """Keep a benchmarked bot's timings out of a running server's /metrics (they go to
+    directory instead) and its queries out of the query log. Returns bot."""
+    bot.metrics.close()
+    bot.metrics = Metrics(os.path.join(directory, "metrics"))
+    bot.query_log.enabled = False
+    return bot
@@ -1,119 +1,96 @@
+import hashlib
 import os
+import tempfile
+import time
 from unidecode import unidecode
 import configparser
 import re
-from difflib import get_close_matches
+from audio_manifest import AudioManifest
+from lexicon_store import LexiconStore
+from metrics import Metrics
+from query_log import QueryLog
+from result_cache import ResultCache
+
+# Common fillers / prefixes in English/Tagalog, compiled once instead of on every call
+_FILLER_PATTERNS = [re.compile(f) for f in (
+    r"\bwhat is\b", r"\bwhat's\b", r"\bcan you translate\b", r"\bplease translate\b",
+    r"\bano ang\b", r"\bano yung\b", r"\bano ito\b", r"\bpaki translate\b", r"\bpaki\b",
+    r"\banong\b", r"\bmeaning ng\b", r"\bkahulugan ng\b", r"\btranslate\b"
+)]
+_PUNCTUATION = re.compile(r"[\.,!?;:\-_/\\'\"]+")
+_SPACES = re.compile(r"\s+")
 
 class Bot:
     # List of commands that will end the conversation
     exit_commands = ("bye", "exit", "ty", "thanks", "done", "quit", "stop")
     
-    # Dictionary of translations for supported phrases
-    # Each key is an English phrase, with translations in Filipino and Casiguran Agta
-    translations = {
-        # Greetings and Common Phrases
-        "What is your name": {"filipino": "Ano ang pangalan mo?", "casiguran_agta": "Anya i ngahen moa"},
-        "Goodbye": {"filipino": "Paalam.", "casiguran_agta": "Naydén kako dén"},
-        "Thank you": {"filipino": "Maraming salamat.", "casiguran_agta": "Me ado a salamat"},
-        "I am sorry": {"filipino": "Patawarin mo ako.", "casiguran_agta": "Patawadén nék mo"},
-        "Yes": {"filipino": "Opo", "casiguran_agta": "On"},
-        "No": {"filipino": "Hindi po", "casiguran_agta": "Ewan be"},
-        "My name is": {"filipino": "Ako si", "casiguran_agta": "Saken ti"},
-        "Good to see you": {"filipino": "Buti na lang nakita kita", "casiguran_agta": "Meta"},
-        "How are you": {"filipino": "Kamusta ka na?", "casiguran_agta": "Kumusta kam dén"},
-        "I am fine": {"filipino": "Mabuti naman.", "casiguran_agta": "Ma ige be"},
-        "Glad to meet you": {"filipino": "Masaya akong makilala ka", "casiguran_agta": "Mesahat ék a matenggi taka"},
-        "Good afternoon": {"filipino": "Magandang hapon", "casiguran_agta": "Memahal a apon"},
-        "Good noon": {"filipino": "Magandang tanghali", "casiguran_agta": "Memahal a tanghali"},
-        "Good evening": {"filipino": "Magandang gabi", "casiguran_agta": "Memahal a kélép"},
-        "Good morning": {"filipino": "Magandang umaga", "casiguran_agta": "Memahal a gagabi"},
-        "How about you": {"filipino": "Kayo po? / Ikaw?", "casiguran_agta": "Sikam"},
-
-        # Words
-        "Family": {"filipino": "Pamilya", "casiguran_agta": "Metétena"},
-        "Happy": {"filipino": "Masaya", "casiguran_agta": "Mesahat"},
-        "Near": {"filipino": "Malapit", "casiguran_agta": "Asadek"},
-        "Cold": {"filipino": "Malamig", "casiguran_agta": "Medignen"},
-
-        # Weather
-        "Rainy": {"filipino": "Maulan", "casiguran_agta": "Me uden"},
-        "Cloudy": {"filipino": "Maulap", "casiguran_agta": "Me habuhab"},
-        "Summer": {"filipino": "Tag-init", "casiguran_agta": "Tag init"},
-        "Rainy season": {"filipino": "Tag-ulan", "casiguran_agta": "Tag udén"},
-        "Warm": {"filipino": "Mainit", "casiguran_agta": "Me pasi"},
-        "Windy": {"filipino": "Maulap", "casiguran_agta": "Me pahés"},
-
-        # Animals
-        "Dog": {"filipino": "Aso", "casiguran_agta": "Aso"},
-        
-        # Daily Use Expressions
-        "Excuse me": {"filipino": "Makikiraan po", "casiguran_agta": "Mékidiman kame"},
-        "Im leaving": {"filipino": "Aalis na po ako", "casiguran_agta": "Még dema kamedén"},
-        "Can you help me": {"filipino": "Maaari mo ba akong tulungan?", "casiguran_agta": "Pwede ék moy tulungan"},
-        "What can I do for you": {"filipino": "Ano po ang magagawa ko para sa inyo?", "casiguran_agta": "Anyá i magimet koa para dekam"},
-        "I understand": {"filipino": "Naiintindihan ko", "casiguran_agta": "Meentendian ko"},
-        
-        # Question Words
-        "What": {"filipino": "Ano?", "casiguran_agta": "Anya"},
-        "When": {"filipino": "Kailan?", "casiguran_agta": "Ni kesya"},
-        "Where": {"filipino": "Saan?", "casiguran_agta": "Tahe"},
-        "Which": {"filipino": "Alin?", "casiguran_agta": "Nahe"},
-        "Who": {"filipino": "Sino?", "casiguran_agta": "Te esya"},
-        "Why": {"filipino": "Bakit?", "casiguran_agta": "Ata ay"},
-        "How much": {"filipino": "Magkano?", "casiguran_agta": "Sanganya?"},
-
-        # Colors
-        "Blue": {"filipino": "Asul", "casiguran_agta": "Asul"},
-        "Red": {"filipino": "Pula", "casiguran_agta": "Medingat"},
-        "White": {"filipino": "Puti", "casiguran_agta": "Melatak"},
-        "Black": {"filipino": "Itim", "casiguran_agta": "mengitet"},
-        "Green": {"filipino": "Berde", "casiguran_agta": "Kumanidon"},
-        "Yellow": {"filipino": "Dilaw", "casiguran_agta": "Medilaw"},
-        "Brown": {"filipino": "Kulay tsokolate", "casiguran_agta": "Tsokolate"},
-        "Gray": {"filipino": "Kulay abo", "casiguran_agta": "Kulay abo"},
-        "Pink": {"filipino": "Rosas", "casiguran_agta": "Rosas"},
-        "Orange": {"filipino": "Dalandan", "casiguran_agta": "Kuman a don"},
-        "Violet": {"filipino": "Lila", "casiguran_agta": "Kuman a pensél"},
-
-        # Family Members
-        "Grandfather": {"filipino": "Lolo", "casiguran_agta": "Boboy lakay"},
-        "Grandmother": {"filipino": "Lola", "casiguran_agta": "Boboy bakés"},
-        "Father": {"filipino": "Tatay", "casiguran_agta": "Améng"},
-        "Mother": {"filipino": "Nanay", "casiguran_agta": "Inéng"},
-        "Older brother": {"filipino": "Kuya", "casiguran_agta": "Kakéng"},
-        "Older sister": {"filipino": "Ate", "casiguran_agta": "Kakéng"},
-        "Youngest sibling": {"filipino": "Bunso", "casiguran_agta": "Depos"},
-        "Husband": {"filipino": "Asawang lalaki", "casiguran_agta": "Asawa a lalaki"},
-        "Wife": {"filipino": "Asawang babae", "casiguran_agta": "Asawa a babe"},
-        "Son": {"filipino": "Anak na lalaki", "casiguran_agta": "Anak a lalake"},
-        "Daughter": {"filipino": "Anak na babae", "casiguran_agta": "Anak a babe"},
-        "Aunt": {"filipino": "Tiya", "casiguran_agta": "Dada"},
-        "Cousin": {"filipino": "Pinsan", "casiguran_agta": "Pensan"},
-        "Uncle": {"filipino": "Tiyo", "casiguran_agta": "Lele"},
-        "Niece": {"filipino": "Pamangkin", "casiguran_agta": "Anéng"},
-        "Nephew": {"filipino": "Pamangkin", "casiguran_agta": "Anéng"},
-        
-        # Buying and Selling
-        "How much? How many?": {"filipino": "Magkano? Ilan?", "casiguran_agta": "Sanganya?"},
-        "How much for two": {"filipino": "Magkano ang dalawa?", "casiguran_agta": "Sangan éduwa"},
-        "I will get two": {"filipino": "Kukuha ako ng dalawa", "casiguran_agta": "Mangalap pékta éduwa"},
-        "Okay, you can get them": {"filipino": "Sige kunin mo na", "casiguran_agta": "Nay alapén mo dén"},
-        "It is fifty pesos": {"filipino": "Limampung piso ito", "casiguran_agta": "Lima apulo ye"},
-        "The two are 100 pesos": {"filipino": "Isang daang piso ang dalawa", "casiguran_agta": "Esa a daan éduwa"},
-
-        # Giving Directions
-        "Where are you going": {"filipino": "Saan ka pupunta?", "casiguran_agta": "Ahe ka umange"},
-        "Im going to the garden": {"filipino": "Pupunta ako sa halamanan", "casiguran_agta": "Ange ékta sikaw"},
-        "The garden is by the river": {"filipino": "Malapit sa ilog ang halamanan", "casiguran_agta": "Adene ta dinom ya tu sikaw"},
-        "Whose garden is it": {"filipino": "Kaninong halamanan iyon?", "casiguran_agta": "Kini esya a sikaw ya"},
-        "It is my garden": {"filipino": "Sa akin ang halamanan", "casiguran_agta": "Ko o ko a sikaw"}
-    }
-
-    def __init__(self):
+    def __init__(self, lexicon_path=None, lexicon_source=None):
         config = configparser.ConfigParser()
         config_path = os.path.join(os.path.dirname(__file__), 'config.ini')
         config.read(config_path)
         self.audio_dataset = config.get('Paths', 'audio_dataset')
+        # Translations for supported phrases live in the compiled lexicon file (see lexicon.json).
+        # Each key is an English phrase, with translations in Filipino and Casiguran Agta
+        base_dir = os.path.dirname(__file__)
+        self.lexicon = LexiconStore(
+            lexicon_path or os.path.join(base_dir, config.get('Paths', 'lexicon', fallback='lexicon.db')),
+            lexicon_source or os.path.join(base_dir, config.get('Paths', 'lexicon_source', fallback='lexicon.json')),
+            self._normalize,
+            reload_interval=config.getfloat('Lexicon', 'reload_interval', fallback=2.0)
+        )
+        self.audio = AudioManifest(os.path.join(base_dir, self.audio_dataset))
+        # Recent results keyed on normalized input, since traffic repeats a few phrases a lot
+        self.cache = ResultCache(maxsize=config.getint('Cache', 'size', fallback=1024))
+        # Per-stage timings and match counters, shared across workers through a directory.
+        # The default one is named after this checkout, so two deployments on a host don't mix
+        app_id = hashlib.sha1(os.path.abspath(config_path).encode('utf-8')).hexdigest()[:8]
+        metrics_dir = config.get('Metrics', 'directory', fallback='') or os.path.join(
+            tempfile.gettempdir(), f'bedte-metrics-{app_id}'
+        )
+        self.metrics = Metrics(
+            os.path.join(base_dir, metrics_dir),
+            enabled=config.getboolean('Metrics', 'enabled', fallback=True),
+            flush_interval=config.getfloat('Metrics', 'flush_interval', fallback=5.0)
+        )
+        # Every query and how it matched, so misses can guide which phrases to add next
+        self.query_log = QueryLog(
+            os.path.join(base_dir, config.get('QueryLog', 'path', fallback='logs/requests.jsonl')),
+            enabled=config.getboolean('QueryLog', 'enabled', fallback=True),
+            metrics=self.metrics,
+            queue_size=config.getint('QueryLog', 'queue_size', fallback=10000),
+            batch_size=config.getint('QueryLog', 'batch_size', fallback=256),
+            flush_interval=config.getfloat('QueryLog', 'flush_interval', fallback=1.0),
+            sample_rate=config.getfloat('QueryLog', 'sample_rate', fallback=0.1),
+            max_bytes=config.getint('QueryLog', 'max_bytes', fallback=10 * 1024 * 1024),
+            rotate_interval=config.getfloat('QueryLog', 'rotate_interval', fallback=24 * 60 * 60),
+            backups=config.getint('QueryLog', 'backups', fallback=7)
+        )
+
+    @property
+    def translations(self):
+        """Dictionary of translations for the currently loaded lexicon."""
+        return self.lexicon.get().translations
+
+    def client_bundle(self):
+        """What a browser needs to answer exact matches without calling translate().
+        Returns: dict with the lexicon version, the _normalize() rules as regex sources,
+        entries {english: [filipino, casiguran_agta, audio_url or None]} and the
+        normalized phrase -> english table
+        """
+        lexicon = self.lexicon.get()
+        return {
+            'version': lexicon.version,
+            'normalize': {
+                'punctuation': _PUNCTUATION.pattern,
+                'fillers': [f.pattern for f in _FILLER_PATTERNS],
+                'spaces': _SPACES.pattern
+            },
+            'entries': {
+                english: [t['filipino'], t['casiguran_agta'], self.audio.lookup(english)]
+                for english, t in lexicon.translations.items()
+            },
+            'phrases': lexicon.phrase_to_english
+        }
 
     def _normalize(self, text):
         """Lowercase, remove accents, punctuation, and common fillers in English/Tagalog."""
@@ -121,73 +98,170 @@ class Bot:
             return ""
         text = unidecode(text.lower())
         # Remove punctuation
-        text = re.sub(r"[\.,!?;:\-_/\\'\"]+", " ", text)
+        text = _PUNCTUATION.sub(" ", text)
         # Remove common fillers / prefixes
-        fillers = [
-            r"\bwhat is\b", r"\bwhat's\b", r"\bcan you translate\b", r"\bplease translate\b",
-            r"\bano ang\b", r"\bano yung\b", r"\bano ito\b", r"\bpaki translate\b", r"\bpaki\b",
-            r"\banong\b", r"\bmeaning ng\b", r"\bkahulugan ng\b", r"\btranslate\b"
-        ]
-        for f in fillers:
-            text = re.sub(f, " ", text)
+        for f in _FILLER_PATTERNS:
+            text = f.sub(" ", text)
         # Collapse spaces
-        text = re.sub(r"\s+", " ", text).strip()
+        text = _SPACES.sub(" ", text).strip()
         return text
 
-    def _format_translation(self, english):
-        translations = self.translations[english]
+    def _format_translation(self, english, lexicon):
+        translations = lexicon.translations[english]
         return (
             f"English: {english}\n"
             f"Filipino: {translations['filipino']}\n"
             f"Casiguran Agta: {translations['casiguran_agta']}"
         )
 
+    def _find_segments(self, userinput_norm, lexicon):
+        """Split normalized input into known phrases with one Aho-Corasick pass.
+        Returns: (english keys of the chosen segments in input order, english keys of the
+        other phrases that were found but overlap the chosen ones)
+        """
+        spans = lexicon.scanner.find_all(userinput_norm)
+        chosen = lexicon.scanner.segment(userinput_norm, spans)
+        segments = [lexicon.phrase_to_english[userinput_norm[start:end]] for start, end in chosen]
+        rest = sorted(set(spans) - set(chosen), key=lambda span: span[1] - span[0])
+        others = [lexicon.phrase_to_english[userinput_norm[start:end]] for start, end in rest]
+        return segments, others
+
+    def _lookup(self, userinput, lexicon=None, batch=None):
+        """Full, cached result for one input.
+        lexicon: the snapshot to match against (default: the current one); batch: a
+        (raw input -> normalized, normalized -> result) pair of dicts shared by the inputs
+        of one batch, so each distinct input is normalized and matched only once
+        Returns: (text_response, matched_english_phrase or None, suggestions_list, audio_url or None,
+        segments, branch), where segments is a list of (text_response, matched_english_phrase, audio_url)
+        and branch names the step of translate() that produced the match
+        """
+        start = time.perf_counter()
+        metrics = self.metrics
+        normalized, results = batch if batch is not None else ({}, {})
+        userinput_norm = normalized.get(userinput)
+        if userinput_norm is None:
+            with metrics.time('normalize'):
+                userinput_norm = normalized[userinput] = self._normalize(userinput)
+        if not userinput_norm:
+            metrics.inc('bedte_translate_branch_total', branch='empty')
+            result = ("Please provide a phrase to translate.", None, [], None, [], 'empty')
+            self._log_query(userinput, userinput_norm, result, start)
+            return result
+        result = results.get(userinput_norm)
+        if result is None:
+            result = results[userinput_norm] = self._match(userinput_norm, lexicon or self.lexicon.get())
+        metrics.inc('bedte_translate_branch_total', branch=result[5])
+        if result[1]:
+            metrics.inc('bedte_audio_lookup_total', found='true' if result[3] else 'false')
+        self._log_query(userinput, userinput_norm, result, start)
+        return result
+
+    def _match(self, userinput_norm, lexicon):
+        """_lookup() result for non-empty normalized input, from the cache when possible."""
+        metrics = self.metrics
+        # A new lexicon or new recordings make every cached result stale
+        self.audio.refresh()
+        version = (lexicon.version, self.audio.version)
+        # A batch still matching against the snapshot it started with after a reload must
+        # not take the shared cache back to that version, clearing what /chat stored since
+        cached = lexicon.version == self.lexicon.get().version
+        if cached:
+            self.cache.set_version(version)
+            result = self.cache.get(userinput_norm, version=version)
+            if result is not None:
+                metrics.inc('bedte_translate_cache_total', result='hit')
+                return result
+            metrics.inc('bedte_translate_cache_total', result='miss')
+        else:
+            metrics.inc('bedte_translate_cache_total', result='bypass')
+        text_response, matched, suggestions, branch, found = self._translate_normalized(userinput_norm, lexicon)
+        with metrics.time('audio'):
+            audio_url = self.audio.lookup(matched)
+            segments = [(self._format_translation(eng, lexicon), eng, self.audio.lookup(eng)) for eng in found]
+        result = (text_response, matched, suggestions, audio_url, segments, branch)
+        if cached:
+            # Dropped if another thread moved the cache to a newer version meanwhile
+            self.cache.put(userinput_norm, result, version)
+        return result
+
+    def _log_query(self, userinput, userinput_norm, result, start):
+        self.query_log.log(
+            query=userinput,
+            normalized=userinput_norm,
+            branch=result[5],
+            matched_phrase=result[1],
+            suggestions=result[2],
+            latency_ms=round((time.perf_counter() - start) * 1000, 3)
+        )
+
+    def translate_full(self, userinput):
+        """Translates user input and resolves the audio for it and for each phrase found in it.
+        Returns: (text_response, matched_english_phrase or None, suggestions_list, audio_url or None,
+        segments), where segments is a list of (text_response, matched_english_phrase, audio_url)
+        """
+        text_response, matched, suggestions, audio_url, segments, _ = self._lookup(userinput)
+        return text_response, matched, list(suggestions), audio_url, list(segments)
+
+    def translate_many(self, userinputs):
+        """Translates a batch of inputs against one lexicon snapshot, normalizing and matching
+        each distinct input only once.
+        Yields: the translate_full() result for each input, in input order
+        """
+        lexicon = self.lexicon.get()
+        batch = ({}, {})
+        for userinput in userinputs:
+            text_response, matched, suggestions, audio_url, segments, _ = self._lookup(userinput, lexicon, batch)
+            yield text_response, matched, list(suggestions), audio_url, list(segments)
+
     def translate(self, userinput):
         """Translates user input with fuzzy matching and filler removal.
         Returns: (text_response, matched_english_phrase or None, suggestions_list)
         """
         if not userinput:
             return "Please provide a phrase to translate.", None, []
+        return self.translate_full(userinput)[:3]
 
-        userinput_norm = self._normalize(userinput)
-        if not userinput_norm:
-            return "Please provide a phrase to translate.", None, []
-
-        # Build search corpus of phrases (map normalized phrase -> english key)
-        phrase_to_english = {}
-        corpus = []
-        for english, translations in self.translations.items():
-            entries = [english, translations['filipino'], translations['casiguran_agta']]
-            for e in entries:
-                norm = self._normalize(e)
-                if not norm:
-                    continue
-                phrase_to_english[norm] = english
-                corpus.append(norm)
+    def _translate_normalized(self, userinput_norm, lexicon):
+        """Match normalized input against the lexicon.
+        Returns: (text_response, matched_english_phrase or None, suggestions_list, branch,
+        english keys of the phrases found in the input, in input order)
+        """
+        metrics = self.metrics
+        phrase_to_english = lexicon.phrase_to_english
 
         # 1) Exact normalized match across any language
         if userinput_norm in phrase_to_english:
             eng = phrase_to_english[userinput_norm]
-            return self._format_translation(eng), eng, []
+            return self._format_translation(eng, lexicon), eng, [], 'exact', [eng]
 
-        # 2) Substring/includes match (e.g., input contains the word)
-        includes = [p for p in corpus if p in userinput_norm or userinput_norm in p]
+        # 2) Substring/includes match: phrases found in the input (in reading order),
+        # otherwise longer phrases that contain the input (shortest first)
+        with metrics.time('segment'):
+            segments, others = self._find_segments(userinput_norm, lexicon)
+        includes = segments + others
+        if not includes:
+            with metrics.time('containing'):
+                # Only the best match and up to five suggestions are needed
+                for phrase in lexicon.fuzzy_index.containing(userinput_norm):
+                    eng = phrase_to_english[phrase]
+                    if eng not in includes:
+                        includes.append(eng)
+                        if len(includes) > 5:
+                            break
         if includes:
-            # Prefer the shortest include as likely precise term
-            includes.sort(key=len)
-            eng = phrase_to_english[includes[0]]
-            # Suggestions: other close includes mapped back to English, unique
+            eng = includes[0]
+            # Suggestions: the other segments and includes, unique
             suggestions = []
             seen = set([eng])
-            for p in includes[1:6]:
-                e = phrase_to_english[p]
+            for e in includes[1:]:
                 if e not in seen:
                     seen.add(e)
                     suggestions.append(e)
-            return self._format_translation(eng), eng, suggestions
+            return self._format_translation(eng, lexicon), eng, suggestions[:5], 'substring', segments
 
-        # 3) Fuzzy match against the corpus
-        close = get_close_matches(userinput_norm, corpus, n=5, cutoff=0.6)
+        # 3) Fuzzy match against the corpus, as difflib.get_close_matches would rank it
+        with metrics.time('fuzzy'):
+            close = lexicon.fuzzy_index.search(userinput_norm, n=5)
         if close:
             eng_top = phrase_to_english[close[0]]
             # Build unique English suggestions (skip the top match)
@@ -198,24 +272,7 @@ class Bot:
                 if e not in seen:
                     seen.add(e)
                     suggestions.append(e)
-            return self._format_translation(eng_top), eng_top, suggestions
+            return self._format_translation(eng_top, lexicon), eng_top, suggestions, 'fuzzy', []
 
         # 4) If nothing found, provide detailed category guidance
-        categories = {
-            "Greetings": ["Good morning", "Good afternoon", "Good evening", "How are you", "I am fine", "Goodbye", "Thank you", "Glad to meet you", "Good to see you", "How about you"],
-            "Family Members": ["Father", "Mother", "Grandfather", "Grandmother", "Older Brother", "Older Sister", "Youngest Sibling", "Husband", "Wife", "Son", "Daughter", "Aunt", "Cousin", "Uncle", "Nephew", "Niece"],
-            "Colors": ["Blue", "Red", "White", "Black", "Green", "Yellow", "Brown", "Gray", "Pink", "Orange", "Violet"],
-            "Animals": ["Dog"],
-            "Question Words": ["What", "When", "Where", "Which", "Who", "Why", "How much"],
-            "Daily Expressions": ["Excuse me", "I'm leaving", "Can you help me", "What can I do for you", "I understand"],
-            "Words": ["Family", "Happy", "Near", "Rainy", "Cold"],
-            "Buying and Selling": ["How much for two", "I will get two", "Okay, you can get them", "It is fifty pesos", "The two are 100 pesos"],
-            "Giving Directions": ["Where are you going", "I'm going to the garden", "The garden is by the river", "Whose garden is it", "It is my garden"]
-        }
-        
-        guide_parts = ["I couldn't find a close match. Here are categories you can try:"]
-        for category, items in categories.items():
-            guide_parts.append(f"{category}: {', '.join(items)}")
-        
-        guide = "\n".join(guide_parts)
-        return guide, None, []
\ No newline at end of file
+        return lexicon.guide, None, [], 'none', []
\ No newline at end of file
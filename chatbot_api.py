@@ -1,23 +1,113 @@
-from flask import Flask, request, jsonify, send_from_directory
+import hashlib
+import json
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from bot import Bot
-import os
-import re
+from audio_manifest import OPTIMIZED_NAME
 
 app = Flask(__name__)
 translator_bot = Bot()
+audio_manifest = translator_bot.audio
+
+AUDIO_MAX_AGE = 365 * 24 * 60 * 60
+# The lexicon hot-reloads, so browsers revalidate the bundle (by ETag) after an hour
+LEXICON_MAX_AGE = 60 * 60
+MAX_BATCH_SIZE = 1000
+
+# (lexicon version, audio manifest version) -> serialized /lexicon bundle and its ETag
+_lexicon_bundle = {'key': None, 'body': None, 'etag': None}
 
 @app.route('/')
 def serve_index():
     return send_from_directory('.', 'index.html')
 
+@app.route('/sw.js')
+def serve_service_worker():
+    # Served from the root so it can cache the page, /lexicon and /audio for offline use
+    return send_from_directory('.', 'sw.js', max_age=0)
+
+@app.route('/lexicon')
+def serve_lexicon():
+    """The lexicon, its normalized keys and audio URLs, for translating exact matches in the browser."""
+    audio_manifest.refresh()
+    key = (translator_bot.lexicon.get().version, audio_manifest.version)
+    if _lexicon_bundle['key'] != key:
+        body = json.dumps(translator_bot.client_bundle(), ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+        body = body.encode('utf-8')
+        _lexicon_bundle.update(key=key, body=body, etag=hashlib.sha1(body).hexdigest()[:16])
+
+    response = Response(_lexicon_bundle['body'], mimetype='application/json')
+    response.set_etag(_lexicon_bundle['etag'])
+    response.cache_control.public = True
+    response.cache_control.max_age = LEXICON_MAX_AGE
+    return response.make_conditional(request)
+
 @app.route('/audio/<path:filename>')
 def serve_audio(filename):
-    audio_dir = os.path.join(os.path.dirname(__file__), 'audio_datasets')
-    return send_from_directory(audio_dir, filename)
+    # Conditional responses give ETag/If-None-Match and Range (206) handling
+    match = OPTIMIZED_NAME.search(filename)
+    if not match:
+        # Originals can change in place, so clients revalidate them
+        return send_from_directory(audio_manifest.root, filename, conditional=True)
+
+    # Optimized variants are named by their content hash and never change
+    response = send_from_directory(
+        audio_manifest.root, filename, conditional=True,
+        etag=match.group(0)[1:-len('.wav')], max_age=AUDIO_MAX_AGE
+    )
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/audio/manifest')
+def serve_audio_manifest():
+    missing, orphans = audio_manifest.check(translator_bot.translations)
+    return jsonify({
+        'entries': audio_manifest.entries(),
+        'missing': missing,
+        'orphans': orphans
+    })
+
+def chat_result(translation_result, matched_phrase, suggestions, audio_url, segments):
+    """Build the /chat response body for one Bot.translate_full() result."""
+    # Compose friendly response (no DB augmentation)
+    all_suggestions = list(dict.fromkeys(suggestions or []))
+
+    return {
+        'response': translation_result,
+        'audio_url': audio_url,
+        'matched_phrase': matched_phrase,
+        'suggestions': all_suggestions,
+        'segments': [{
+            'response': segment_result,
+            'audio_url': segment_audio_url,
+            'matched_phrase': segment_phrase
+        } for segment_result, segment_phrase, segment_audio_url in segments]
+    }
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(translator_bot.cache.stats())
+
+@app.route('/query-log/stats')
+def query_log_stats():
+    """Query log records written, queued and dropped by the worker serving this request."""
+    return jsonify(translator_bot.query_log.stats())
+
+@app.route('/metrics')
+def serve_metrics():
+    """Prometheus metrics, summed over every gunicorn worker."""
+    return Response(translator_bot.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.after_request
+def record_request(response):
+    metrics = translator_bot.metrics
+    metrics.inc('bedte_requests_total', endpoint=request.endpoint or 'unknown', status=response.status_code)
+    return response
 
 @app.route('/chat', methods=['POST'])
 def chat():
-    data = request.json
+    metrics = translator_bot.metrics
+    with metrics.time('parse'):
+        data = request.json
     if not data:
         return jsonify({'error': 'Invalid request'}), 400
 
@@ -25,36 +115,49 @@ def chat():
     if not user_message:
         return jsonify({'response': 'Please send a message.'})
 
-    translation_result, matched_phrase, suggestions = translator_bot.translate(user_message)
-    
-    # Try to find audio file
-    audio_url = None
-    if matched_phrase:
-
-        # ✅ Remove punctuation (?, !, ., etc.) before searching
-        clean_phrase = re.sub(r'[^\w\s]', '', matched_phrase)
-
-        space_name = matched_phrase.strip().lower() + ".wav"
-        underscore_name = clean_phrase.strip().lower().replace(" ", "_") + ".wav"
-        
-        for folder in ["Family_Members", "Greetings", "Animals", "Words", "Weather", "Question_Words", "Giving_Directions", "Daily_Use_Expressions", "Colors", "Buying_and_Selling"]:
-            for filename in [space_name, underscore_name]:
-                audio_path = os.path.join(os.path.dirname(__file__), "audio_datasets", folder, filename)
-                if os.path.exists(audio_path):
-                    audio_url = f"/audio/{folder}/{filename}"
-                    break
-            if audio_url:
-                break
+    # Also translates each known phrase in longer sentences, e.g. "good morning father, how are you"
+    with metrics.time('translate'):
+        result = chat_result(*translator_bot.translate_full(user_message))
+    with metrics.time('serialize'):
+        return jsonify(result)
 
-    # Compose friendly response (no DB augmentation)
-    all_suggestions = list(dict.fromkeys(suggestions or []))
+@app.route('/chat/batch', methods=['POST'])
+def chat_batch():
+    """Translate many messages in one request.
 
-    return jsonify({
-        'response': translation_result,
-        'audio_url': audio_url,
-        'matched_phrase': matched_phrase,
-        'suggestions': all_suggestions
-    })
+    Body: {"messages": ["...", ...], "stream": false}. Results come back in input order with
+    the same shape as /chat, either as {"results": [...]} or, with "stream": true (or
+    Accept: application/x-ndjson), as one JSON object per line while the batch runs.
+    """
+    data = request.json
+    messages = data.get('messages') if isinstance(data, dict) else None
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({'error': 'Invalid request'}), 400
+    if len(messages) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} messages per batch'}), 400
+
+    messages = [m.strip() for m in messages]
+    # Empty messages get the same reply as /chat; the rest are translated together
+    translated = translator_bot.translate_many(m for m in messages if m)
+
+    def results():
+        for message in messages:
+            if not message:
+                yield {'response': 'Please send a message.'}
+            else:
+                yield chat_result(*next(translated))
+
+    stream = data.get('stream') or request.accept_mimetypes.best == 'application/x-ndjson'
+    if not stream:
+        return jsonify({'results': list(results())})
+
+    def generate():
+        for result in results():
+            yield app.json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 if __name__ == '__main__':
+    # As gunicorn's on_starting does: snapshots from an earlier run don't belong to this one
+    translator_bot.metrics.clear_directory()
     app.run(debug=True)
\ No newline at end of file
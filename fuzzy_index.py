@@ -0,0 +1,196 @@
+from collections import Counter
+from difflib import SequenceMatcher
+from heapq import heappush, heapreplace
+from itertools import chain
+
+
+def _trigrams(text):
+    """Return the set of character trigrams of text, padded so short words still share grams."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _char_masks(text):
+    """Map each character of text to a bitmask of the positions it occurs at."""
+    masks = {}
+    for i, ch in enumerate(text):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    return masks
+
+
+def _lcs_length(masks, length, other):
+    """Length of the longest common subsequence, bit-parallel (Hyyro) over the masked string."""
+    full = (1 << length) - 1
+    v = full
+    for ch in other:
+        u = v & masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+    return length - bin(v).count("1")
+
+
+class FuzzyIndex:
+    """Inverted indexes over normalized phrases for difflib-compatible fuzzy lookups.
+
+    Built once from the corpus. search() returns what difflib.get_close_matches would for
+    the same corpus without scoring every phrase: a character index gives each phrase of
+    a compatible length an upper bound on its ratio (difflib's quick_ratio), and phrases
+    are scored best bound first until no remaining one can enter the top n.
+
+    The work per query is capped for very large corpora, and past the caps results are
+    no longer exactly get_close_matches' (usually the best match still is, but lower
+    suggestions differ). When a query's character postings exceed char_budget,
+    candidates come from a trigram index instead (rarest grams first, within
+    postings_budget), which misses matches sharing no trigram with the query; and at
+    most max_scored candidates are scored. benchmarks/fuzzy_parity.py checks both.
+    """
+
+    def __init__(self, phrases, cutoff=0.6, max_candidates=64, postings_budget=2000, char_budget=10000,
+                 max_scored=256):
+        self.cutoff = cutoff
+        self.max_candidates = max_candidates
+        self.postings_budget = postings_budget
+        self.char_budget = char_budget
+        self.max_scored = max_scored
+        self.phrases = []
+        # get_close_matches returns a phrase once per occurrence in the corpus
+        self._occurrences = []
+        ids = {}
+        postings = {}
+        chars = {}
+        for phrase in phrases:
+            if not phrase:
+                continue
+            phrase_id = ids.get(phrase)
+            if phrase_id is not None:
+                self._occurrences[phrase_id] += 1
+                continue
+            phrase_id = ids[phrase] = len(self.phrases)
+            self.phrases.append(phrase)
+            self._occurrences.append(1)
+            for gram in _trigrams(phrase):
+                postings.setdefault(gram, []).append(phrase_id)
+            # (length, char, k) -> phrases of that length with at least k of char
+            for ch, count in Counter(phrase).items():
+                for k in range(1, count + 1):
+                    chars.setdefault((len(phrase), ch, k), []).append(phrase_id)
+        self._postings = postings
+        self._chars = chars
+
+        # Every 1- and 2-character substring -> the phrases containing it, shortest first,
+        # since trigrams can't narrow down inputs that short
+        short_substrings = {}
+        for phrase_id in sorted(range(len(self.phrases)), key=lambda i: (len(self.phrases[i]), i)):
+            phrase = self.phrases[phrase_id]
+            for sub in set(phrase).union(phrase[i:i + 2] for i in range(len(phrase) - 1)):
+                short_substrings.setdefault(sub, []).append(phrase_id)
+        self._short_substrings = short_substrings
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _length_window(self, length):
+        """Shortest and longest phrase that can have a ratio >= cutoff with a query of length."""
+        shortest = next(p for p in range(1, length + 1) if 2.0 * p / (length + p) >= self.cutoff)
+        longest = length
+        while 2.0 * length / (length + longest + 1) >= self.cutoff:
+            longest += 1
+        return shortest, longest
+
+    def _char_candidates(self, text):
+        """(bound, phrase id) for every phrase of a compatible length whose characters overlap
+        text enough to reach the cutoff, where bound is difflib's quick_ratio (an upper bound
+        on its ratio); None if that means reading more than char_budget postings."""
+        tokens = [(ch, k) for ch, count in Counter(text).items() for k in range(1, count + 1)]
+        shortest, longest = self._length_window(len(text))
+        per_length = []
+        work = 0
+        for length in range(shortest, longest + 1):
+            lists = [self._chars[key] for key in ((length,) + token for token in tokens) if key in self._chars]
+            work += sum(map(len, lists))
+            if work > self.char_budget:
+                return None
+            per_length.append((len(text) + length, lists))
+
+        candidates = []
+        for total, lists in per_length:
+            for phrase_id, overlap in Counter(chain.from_iterable(lists)).items():
+                bound = 2.0 * overlap / total
+                if bound >= self.cutoff:
+                    candidates.append((bound, phrase_id))
+        return candidates
+
+    def _trigram_candidates(self, text):
+        """Phrase ids sharing the most trigrams with text, counting the rarest grams first.
+
+        Very common grams ("ng ", " ma") would make counting linear in the corpus, so past
+        the rarest gram, posting lists are only counted while the postings budget lasts.
+        """
+        lists = sorted(
+            (self._postings[gram] for gram in _trigrams(text) if gram in self._postings),
+            key=len,
+        )
+        total = 0
+        taken = []
+        for postings in lists:
+            if taken and total + len(postings) > self.postings_budget:
+                break
+            total += len(postings)
+            taken.append(postings)
+        shared = Counter(chain.from_iterable(taken))
+        return [phrase_id for phrase_id, _ in shared.most_common(self.max_candidates)]
+
+    def containing(self, text):
+        """Yield the phrases that contain text as a substring, shortest first (then in corpus order)."""
+        if not text:
+            return
+        if len(text) < 3:
+            # Precomputed and already in order, so callers can stop after the first few
+            for phrase_id in self._short_substrings.get(text, ()):
+                yield self.phrases[phrase_id]
+            return
+        # Every trigram inside text must also be inside a phrase containing it
+        grams = {text[i:i + 3] for i in range(len(text) - 2)}
+        lists = sorted((self._postings.get(gram, []) for gram in grams), key=len)
+        candidates = set(lists[0]).intersection(*lists[1:])
+        for phrase_id in sorted(candidates, key=lambda i: (len(self.phrases[i]), i)):
+            if text in self.phrases[phrase_id]:
+                yield self.phrases[phrase_id]
+
+    def search(self, text, n=5):
+        """Return up to n phrases whose difflib ratio to text is at least the cutoff, best
+        first, as difflib.get_close_matches(text, corpus, n, cutoff) would."""
+        if not text or n <= 0:
+            return []
+        candidates = self._char_candidates(text)
+        if candidates is None:
+            candidates = [(1.0, phrase_id) for phrase_id in self._trigram_candidates(text)]
+
+        # Best bound first, so scoring can stop once no candidate left can make the top n
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        del candidates[self.max_scored:]
+
+        masks = _char_masks(text)
+        shortest, longest = self._length_window(len(text))
+        matcher = SequenceMatcher()
+        matcher.set_seq2(text)
+        top = []  # min-heap of the n best (ratio, phrase), one entry per corpus occurrence
+        for bound, phrase_id in candidates:
+            if len(top) == n and bound < top[0][0]:
+                break
+            phrase = self.phrases[phrase_id]
+            if not shortest <= len(phrase) <= longest:
+                continue
+            # difflib's matching blocks form a common subsequence, so this also bounds its ratio
+            bound = 2.0 * _lcs_length(masks, len(text), phrase) / (len(text) + len(phrase))
+            if bound < self.cutoff or (len(top) == n and bound < top[0][0]):
+                continue
+            matcher.set_seq1(phrase)
+            score = matcher.ratio()
+            if score < self.cutoff:
+                continue
+            for _ in range(self._occurrences[phrase_id]):
+                if len(top) < n:
+                    heappush(top, (score, phrase))
+                elif (score, phrase) > top[0]:
+                    heapreplace(top, (score, phrase))
+        return [phrase for _, phrase in sorted(top, reverse=True)]
@@ -0,0 +1,30 @@
+import gc
+
+# Load the app (and the lexicon) once in the master so pre-forked workers share its pages
+preload_app = True
+
+
+def on_starting(server):
+    # Metric snapshots left by a previous run of the server don't belong to this one
+    from chatbot_api import translator_bot
+    translator_bot.metrics.clear_directory()
+
+
+def when_ready(server):
+    # Imported by gunicorn already because of preload_app
+    from chatbot_api import translator_bot
+    translator_bot.lexicon.get()
+    # Only the master recompiles lexicon.json; workers (forked with this setting) just
+    # reload the compiled file when it changes
+    translator_bot.lexicon.compile_source = False
+    translator_bot.lexicon.watch()
+    # Move everything loaded so far out of the collector's reach, so gc passes in the
+    # workers don't write to (and un-share) those pages
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Write out queued query log records and the last metrics before the worker goes away
+    from chatbot_api import translator_bot
+    translator_bot.query_log.close()
+    translator_bot.metrics.flush()
@@ -0,0 +1,256 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from fuzzy_index import FuzzyIndex
+from phrase_scanner import PhraseScanner
+
+logger = logging.getLogger(__name__)
+
+# Phrases listed per category in the guide shown when nothing matches
+GUIDE_ITEMS = 20
+
+
+def build_lexicon(source_path, db_path, normalize):
+    """Compile the JSON lexicon into an SQLite file with its normalized phrase keys precomputed.
+
+    The file is written next to db_path and renamed into place, so running workers
+    never open a half-written store. Returns the version hash of the compiled lexicon.
+    """
+    with open(source_path, encoding='utf-8') as f:
+        source = json.load(f)
+    entries = []
+    for category, items in source.items():
+        for english, translations in items.items():
+            entries.append((english, translations['filipino'], translations['casiguran_agta'], category))
+    version = hashlib.sha1(json.dumps(entries, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+    # Normalized key of every phrase in every language, in lexicon order
+    phrases = []
+    for position, (english, filipino, casiguran_agta, _) in enumerate(entries):
+        for text in (english, filipino, casiguran_agta):
+            norm = normalize(text)
+            if norm:
+                phrases.append((norm, position))
+
+    # Created like a plain open() would (0644 less the umask) rather than mkstemp's 0600,
+    # so a server running as another user than the build step can still read it
+    tmp_path = f"{os.path.abspath(db_path)}.{uuid.uuid4().hex[:8]}.tmp"
+    os.close(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+    try:
+        conn = sqlite3.connect(tmp_path)
+        with conn:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE entries (position INTEGER PRIMARY KEY, english TEXT, "
+                "filipino TEXT, casiguran_agta TEXT, category TEXT)"
+            )
+            conn.execute("CREATE TABLE phrases (norm TEXT, position INTEGER)")
+            conn.execute("INSERT INTO meta VALUES ('version', ?)", (version,))
+            conn.executemany(
+                "INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                [(position,) + entry for position, entry in enumerate(entries)],
+            )
+            conn.executemany("INSERT INTO phrases VALUES (?, ?)", phrases)
+        conn.execute("VACUUM")
+        conn.close()
+        os.replace(tmp_path, db_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return version
+
+
+class Lexicon:
+    """One loaded version of the lexicon together with the indexes derived from it."""
+
+    def __init__(self, version, entries, phrases):
+        self.version = version
+        self.translations = {}
+        self.categories = {}
+        for english, filipino, casiguran_agta, category in entries:
+            self.translations[english] = {'filipino': filipino, 'casiguran_agta': casiguran_agta}
+            self.categories.setdefault(category, []).append(english)
+        # Category guidance for input that matches nothing, from this version's vocabulary
+        self.guide = "\n".join(
+            ["I couldn't find a close match. Here are categories you can try:"]
+            + [f"{category}: {', '.join(items[:GUIDE_ITEMS])}" for category, items in self.categories.items()]
+        )
+
+        # Map normalized phrase -> english key, in any of the three languages
+        self.phrase_to_english = {}
+        self.corpus = []
+        for norm, english in phrases:
+            self.phrase_to_english[norm] = english
+            self.corpus.append(norm)
+        self.fuzzy_index = FuzzyIndex(self.corpus, cutoff=0.6)
+        self.scanner = PhraseScanner(self.corpus)
+
+
+class LexiconStore:
+    """Lazily loads the compiled lexicon and hot-reloads it when the file changes.
+
+    Nothing is read until the first get(). After that the file is stat()ed at most once
+    every reload_interval seconds; a new mtime/size/inode loads a fresh Lexicon in a
+    background thread (its indexes are built in the process that loads it) and swaps it
+    in once it is ready. If the JSON source is newer than the compiled file it is
+    recompiled first, unless compile_source is off: gunicorn workers leave that to the
+    master (see watch()), so a change to lexicon.json is compiled once rather than by
+    every worker at the same time. A source or compiled file that fails to load is not
+    retried until it changes again.
+    """
+
+    def __init__(self, path, source_path, normalize, reload_interval=2.0, compile_source=True):
+        self.path = path
+        self.source_path = source_path
+        self.normalize = normalize
+        self.reload_interval = reload_interval
+        self.compile_source = compile_source
+        self._lexicon = None
+        self._stamp = None
+        self._failed_source = None
+        self._failed_stamp = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._compile_lock = threading.Lock()
+
+    def get(self):
+        """Return the current Lexicon, loading it on the first call.
+
+        After that, a changed file is loaded by a background thread while every caller,
+        including the one that noticed the change, keeps getting the previous version.
+        """
+        lexicon = self._lexicon
+        if lexicon is None:
+            with self._lock:
+                if self._lexicon is None:
+                    self._refresh()
+                    self._checked_at = time.monotonic()
+                return self._lexicon
+        if time.monotonic() - self._checked_at >= self.reload_interval and self._lock.acquire(blocking=False):
+            # The lock stays held by the reload thread until the new lexicon is swapped in
+            reloading = False
+            try:
+                self._checked_at = time.monotonic()
+                if self._changed():
+                    threading.Thread(target=self._reload, name='lexicon-reload', daemon=True).start()
+                    reloading = True
+            finally:
+                if not reloading:
+                    self._lock.release()
+        return lexicon
+
+    def _changed(self):
+        if self.compile_source and self._stale_source() is not None:
+            return True
+        return self._stat(self.path) not in (self._stamp, self._failed_stamp)
+
+    def _reload(self):
+        try:
+            self._refresh()
+        except (OSError, ValueError, KeyError, sqlite3.Error):
+            # Keep serving the last good lexicon rather than failing requests
+            logger.exception("Could not reload lexicon from %s", self.path)
+        finally:
+            self._checked_at = time.monotonic()
+            self._lock.release()
+
+    @staticmethod
+    def _stat(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _stale_source(self):
+        """Stamp of the JSON source if it is newer than the compiled file and hasn't failed to compile."""
+        source_stamp = self._stat(self.source_path)
+        stamp = self._stat(self.path)
+        if source_stamp is None or (stamp is not None and source_stamp[0] <= stamp[0]):
+            return None
+        if source_stamp == self._failed_source:
+            return None
+        return source_stamp
+
+    def compile_if_stale(self):
+        """Recompile the lexicon if its JSON source is newer than the compiled file.
+        Returns True if it was recompiled.
+        """
+        with self._compile_lock:
+            source_stamp = self._stale_source()
+            if source_stamp is None:
+                return False
+            try:
+                build_lexicon(self.source_path, self.path, self.normalize)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError, sqlite3.Error):
+                self._failed_source = source_stamp
+                if self._lexicon is None and self._stat(self.path) is None:
+                    raise
+                logger.exception("Could not compile %s; keeping %s until it changes", self.source_path, self.path)
+                return False
+            self._failed_source = None
+            return True
+
+    def watch(self):
+        """Recompile from a background thread every reload_interval seconds, e.g. in the
+        gunicorn master while the workers only reload the compiled file."""
+        def run():
+            while True:
+                time.sleep(self.reload_interval)
+                try:
+                    self.compile_if_stale()
+                except Exception:
+                    logger.exception("Lexicon watcher failed")
+
+        thread = threading.Thread(target=run, name='lexicon-compiler', daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh(self):
+        if self.compile_source:
+            self.compile_if_stale()
+        stamp = self._stat(self.path)
+        if stamp is None:
+            raise FileNotFoundError(f"Lexicon not found: {self.path}")
+        if self._lexicon is not None and stamp in (self._stamp, self._failed_stamp):
+            return
+        try:
+            lexicon = self._read()
+        except (OSError, ValueError, KeyError, sqlite3.Error):
+            self._failed_stamp = stamp
+            raise
+        self._lexicon = lexicon
+        self._stamp = stamp
+        self._failed_stamp = None
+
+    def _read(self):
+        # Read-only and closed straight away, so no connection is shared across forked workers
+        conn = sqlite3.connect(Path(os.path.abspath(self.path)).as_uri() + '?mode=ro', uri=True)
+        try:
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            entries = conn.execute(
+                "SELECT english, filipino, casiguran_agta, category FROM entries ORDER BY position"
+            ).fetchall()
+            phrases = conn.execute(
+                "SELECT phrases.norm, entries.english FROM phrases "
+                "JOIN entries ON entries.position = phrases.position ORDER BY phrases.rowid"
+            ).fetchall()
+        finally:
+            conn.close()
+        return Lexicon(version, entries, phrases)
+
+
+if __name__ == '__main__':
+    # Compile the lexicon ahead of time (e.g. during deploy): python lexicon_store.py
+    from bot import Bot
+    bot = Bot()
+    version = build_lexicon(bot.lexicon.source_path, bot.lexicon.path, bot._normalize)
+    print(f"Wrote {bot.lexicon.path} (version {version})")
@@ -0,0 +1,208 @@
+import atexit
+import bisect
+import contextlib
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HELP = {
+    'bedte_stage_seconds': ('histogram', 'Time spent in each stage of translate() and /chat.'),
+    'bedte_translate_branch_total': ('counter', 'Translations by the match branch that produced them.'),
+    'bedte_translate_cache_total': ('counter', 'Result cache lookups by outcome.'),
+    'bedte_audio_lookup_total': ('counter', 'Audio lookups for matched phrases by whether a recording was found.'),
+    'bedte_requests_total': ('counter', 'HTTP requests by endpoint.'),
+    'bedte_query_log_dropped_total': ('counter', 'Query log records not written because the queue was backed up.'),
+}
+
+_NULL_TIMER = contextlib.nullcontext()
+
+logger = logging.getLogger(__name__)
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe('bedte_stage_seconds', time.perf_counter() - self.start, stage=self.stage)
+        return False
+
+
+class Metrics:
+    """Per-process counters and latency histograms, aggregated across gunicorn workers.
+
+    Each process writes a snapshot to <directory>/metrics-<pid>-<id>.json from a daemon
+    thread every flush_interval seconds while it has new data (and at exit); render()
+    sums every snapshot in the directory into Prometheus text format, so a scrape served
+    by any one worker reports the whole server. Snapshots of exited workers are kept so
+    counters never go backwards until the server restarts and clear_directory() is
+    called. When disabled, time() returns a shared no-op context manager and
+    inc()/observe() return immediately.
+    """
+
+    def __init__(self, directory, enabled=True, flush_interval=5.0):
+        self.directory = directory
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._reset()
+        atexit.register(self.flush)
+
+    def _reset(self):
+        # Runs again in each forked worker: it starts from zero with its own snapshot file
+        # and, since threads don't survive fork, its own flusher
+        self._pid = os.getpid()
+        self._path = os.path.join(self.directory, f"metrics-{self._pid}-{uuid.uuid4().hex[:8]}.json")
+        self._counters = {}
+        self._histograms = {}
+        self._dirty = False
+        self._thread = None
+
+    def _prepare(self):
+        # Called with the lock held before recording anything
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='metrics-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        pid = os.getpid()
+        while self.enabled and self._pid == pid:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning("Could not write metrics snapshot %s: %s", self._path, e)
+
+    def _labels(self, labels):
+        return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def time(self, stage):
+        """Context manager recording the duration of a stage in bedte_stage_seconds."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._prepare()
+            self._counters[key] = self._counters.get(key, 0) + amount
+            self._dirty = True
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, self._labels(labels))
+        with self._lock:
+            self._prepare()
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                histogram = self._histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            histogram[bisect.bisect_left(BUCKETS, value)] += 1
+            histogram[-1] += value
+            self._dirty = True
+
+    def flush(self):
+        """Write this process's snapshot if anything was recorded since the last write."""
+        if not self._dirty or self._pid != os.getpid():
+            return
+        # The flusher thread, render() and atexit can all get here; one writes at a time
+        with self._flush_lock:
+            with self._lock:
+                snapshot = {
+                    'counters': [[name, labels, value] for (name, labels), value in self._counters.items()],
+                    'histograms': [[name, labels, values] for (name, labels), values in self._histograms.items()],
+                }
+                self._dirty = False
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._path)
+
+    def close(self):
+        """Stop recording and flushing, including at exit (for throwaway instances, e.g. benchmarks)."""
+        self.enabled = False
+        self._dirty = False
+        atexit.unregister(self.flush)
+
+    def clear_directory(self):
+        """Remove every snapshot, e.g. when the server (re)starts."""
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def _collect(self):
+        counters = {}
+        histograms = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                total = histograms.setdefault(key, [0] * len(values))
+                for i, value in enumerate(values):
+                    total[i] += value
+        return counters, histograms
+
+    def render(self):
+        """All workers' metrics in Prometheus text exposition format."""
+        self.flush()
+        counters, histograms = self._collect()
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+        lines = []
+        for name, (kind, help_text) in HELP.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{fmt(labels)} {value}")
+            else:
+                for (metric, labels), values in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ('+Inf',), values[:-1]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt(labels, [('le', str(bound))])} {cumulative}")
+                    lines.append(f"{name}_sum{fmt(labels)} {values[-1]}")
+                    lines.append(f"{name}_count{fmt(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
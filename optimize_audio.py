@@ -0,0 +1,190 @@
+"""Offline build step: write small, cache-friendly variants of the audio dataset.
+
+Every recording is mixed down to mono, downsampled to 16 kHz, trimmed of leading and
+trailing silence and loudness-normalized, then written next to the original as
+<name>.<content hash>.wav. optimized.json in the dataset folder maps each original to its
+variant; the app serves the variant with immutable caching and falls back to the
+original when there is none.
+
+    python optimize_audio.py
+"""
+import hashlib
+import io
+import json
+import math
+import os
+import re
+import sys
+import wave
+from array import array
+from itertools import accumulate
+
+from audio_manifest import AUDIO_EXTENSIONS, OPTIMIZED_INDEX, OPTIMIZED_NAME
+
+TARGET_RATE = 16000
+TARGET_RMS_DB = -20.0     # loudness of the trimmed clip, dBFS
+PEAK_LIMIT_DB = -1.0      # never push peaks above this, dBFS
+SILENCE_DB = -35.0        # windows this far below the loudest one count as silence
+WINDOW_SECONDS = 0.01
+PAD_SECONDS = 0.05        # keep a little room before/after the voice
+FULL_SCALE = 32767
+
+
+def _db_to_gain(db):
+    return 10 ** (db / 20)
+
+
+def read_samples(data):
+    """Decode a 16-bit PCM WAV into (mono samples as floats, sample rate)."""
+    with wave.open(io.BytesIO(data)) as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"unsupported sample width {w.getsampwidth() * 8} bits")
+        channels, rate = w.getnchannels(), w.getframerate()
+        pcm = array('h')
+        pcm.frombytes(w.readframes(w.getnframes()))
+    if sys.byteorder == 'big':
+        pcm.byteswap()
+    if channels == 1:
+        return [float(s) for s in pcm], rate
+    return [sum(pcm[i:i + channels]) / channels for i in range(0, len(pcm), channels)], rate
+
+
+def downsample(samples, rate, target_rate=TARGET_RATE):
+    """Box-filter decimation: each output sample is the mean of the input samples it covers."""
+    if rate <= target_rate or not samples:
+        return samples, rate
+    ratio = rate / target_rate
+    prefix = list(accumulate(samples, initial=0.0))
+    out = []
+    for i in range(int(len(samples) / ratio)):
+        lo = int(i * ratio)
+        hi = min(len(samples), max(lo + 1, int((i + 1) * ratio)))
+        out.append((prefix[hi] - prefix[lo]) / (hi - lo))
+    return out, target_rate
+
+
+def trim_silence(samples, rate):
+    """Drop leading and trailing windows that are SILENCE_DB below the loudest window."""
+    window = max(1, int(rate * WINDOW_SECONDS))
+    levels = []
+    for start in range(0, len(samples), window):
+        chunk = samples[start:start + window]
+        levels.append(math.sqrt(sum(s * s for s in chunk) / len(chunk)))
+    if not levels or max(levels) == 0:
+        return samples
+    threshold = max(levels) * _db_to_gain(SILENCE_DB)
+    voiced = [i for i, level in enumerate(levels) if level >= threshold]
+    pad = int(rate * PAD_SECONDS)
+    start = max(0, voiced[0] * window - pad)
+    end = min(len(samples), (voiced[-1] + 1) * window + pad)
+    return samples[start:end]
+
+
+def normalize_loudness(samples):
+    """Scale to TARGET_RMS_DB, limited so the peak stays under PEAK_LIMIT_DB."""
+    if not samples:
+        return samples
+    rms = math.sqrt(sum(s * s for s in samples) / len(samples))
+    peak = max(abs(s) for s in samples)
+    if rms == 0:
+        return samples
+    gain = min(FULL_SCALE * _db_to_gain(TARGET_RMS_DB) / rms, FULL_SCALE * _db_to_gain(PEAK_LIMIT_DB) / peak)
+    return [s * gain for s in samples]
+
+
+def encode_wav(samples, rate):
+    pcm = array('h', (max(-FULL_SCALE - 1, min(FULL_SCALE, int(round(s)))) for s in samples))
+    if sys.byteorder == 'big':
+        pcm.byteswap()
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def optimize(data):
+    """Return the optimized WAV bytes for an original recording."""
+    samples, rate = read_samples(data)
+    samples, rate = downsample(samples, rate)
+    samples = trim_silence(samples, rate)
+    samples = normalize_loudness(samples)
+    return encode_wav(samples, rate)
+
+
+def optimize_dataset(root):
+    """Write optimized variants for every recording under root and return the new index."""
+    index_path = os.path.join(root, OPTIMIZED_INDEX)
+    try:
+        with open(index_path, encoding='utf-8') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    index = {}
+    for folder in sorted(e.name for e in os.scandir(root) if e.is_dir()):
+        folder_path = os.path.join(root, folder)
+        names = sorted(os.listdir(folder_path))
+        for name in names:
+            if not name.lower().endswith(AUDIO_EXTENSIONS) or OPTIMIZED_NAME.search(name):
+                continue
+            original = f"{folder}/{name}"
+            with open(os.path.join(folder_path, name), 'rb') as f:
+                data = f.read()
+            source_hash = hashlib.sha1(data).hexdigest()
+
+            entry = previous.get(original)
+            if not (entry and entry.get('source') == source_hash
+                    and os.path.exists(os.path.join(root, entry['file']))):
+                try:
+                    optimized = optimize(data)
+                except (ValueError, wave.Error, EOFError) as e:
+                    print(f"skipped {original}: {e}", file=sys.stderr)
+                    continue
+                digest = hashlib.sha1(optimized).hexdigest()[:10]
+                stem = os.path.splitext(name)[0]
+                variant = f"{stem}.{digest}.wav"
+                with open(os.path.join(folder_path, variant), 'wb') as f:
+                    f.write(optimized)
+                # Drop variants left over from earlier versions of this recording
+                stale = re.compile(re.escape(stem) + OPTIMIZED_NAME.pattern)
+                for other in names:
+                    if other != variant and stale.fullmatch(other):
+                        os.unlink(os.path.join(folder_path, other))
+                entry = {
+                    'file': f"{folder}/{variant}",
+                    'source': source_hash,
+                    'original_bytes': len(data),
+                    'optimized_bytes': len(optimized),
+                }
+            index[original] = entry
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+def savings_report(index):
+    """Per-category byte savings, as printable lines."""
+    totals = {}
+    for original, entry in index.items():
+        category = original.split('/', 1)[0]
+        files, before, after = totals.get(category, (0, 0, 0))
+        totals[category] = (files + 1, before + entry['original_bytes'], after + entry['optimized_bytes'])
+    totals['Total'] = tuple(sum(t[i] for t in totals.values()) for i in range(3))
+
+    lines = [f"{'Category':<24}{'Files':>6}{'Original':>12}{'Optimized':>12}{'Saved':>8}"]
+    for category, (files, before, after) in totals.items():
+        saved = 100 * (before - after) / before if before else 0
+        lines.append(f"{category:<24}{files:>6}{before:>12,}{after:>12,}{saved:>7.1f}%")
+    return lines
+
+
+if __name__ == '__main__':
+    from bot import Bot
+    root = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), Bot().audio_dataset)
+    print("\n".join(savings_report(optimize_dataset(root))))
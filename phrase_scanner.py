@@ -0,0 +1,99 @@
+from collections import deque
+
+
+class PhraseScanner:
+    """Aho-Corasick automaton over normalized phrases.
+
+    Finds every known phrase in a normalized input in one pass, then picks the best
+    non-overlapping segmentation, so "good morning father how are you" yields all three
+    phrases instead of only the shortest one.
+    """
+
+    def __init__(self, phrases):
+        # State 0 is the root; each state has its goto edges, failure link and the
+        # lengths of the phrases that end there (including those reached via failure links)
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for phrase in set(phrases):
+            if phrase:
+                self._add(phrase)
+        self._link()
+
+    def _add(self, phrase):
+        state = 0
+        for ch in phrase:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = nxt
+        self._output[state] = (len(phrase),)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find_all(self, text):
+        """Return (start, end) spans of every phrase in text that starts and ends on a word boundary."""
+        spans = []
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        last = len(text) - 1
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state] and (i == last or text[i + 1] == " "):
+                for length in output[state]:
+                    start = i + 1 - length
+                    if start == 0 or text[start - 1] == " ":
+                        spans.append((start, i + 1))
+        return spans
+
+    def segment(self, text, spans=None):
+        """Pick non-overlapping spans covering the most characters, preferring fewer, longer phrases.
+
+        Returns the chosen (start, end) spans in input order.
+        """
+        if spans is None:
+            spans = self.find_all(text)
+        if not spans:
+            return []
+        ending_at = {}
+        for start, end in spans:
+            ending_at.setdefault(end, []).append(start)
+
+        # best[i] = (characters covered, -segments used) for text[:i]; choice[i] = start of the span ending at i
+        best = [(0, 0)] * (len(text) + 1)
+        choice = [None] * (len(text) + 1)
+        for i in range(1, len(text) + 1):
+            best[i] = best[i - 1]
+            for start in ending_at.get(i, ()):
+                covered, used = best[start]
+                candidate = (covered + i - start, used - 1)
+                if candidate > best[i]:
+                    best[i] = candidate
+                    choice[i] = start
+
+        chosen = []
+        i = len(text)
+        while i > 0:
+            if choice[i] is not None:
+                chosen.append((choice[i], i))
+                i = choice[i]
+            else:
+                i -= 1
+        chosen.reverse()
+        return chosen
@@ -0,0 +1,257 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is not coordinated between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueryLog:
+    """Append-only JSON-lines log of translated queries, written off the request path.
+
+    log() only puts the record on a bounded in-memory queue; a background thread drains
+    it and appends whole batches with a single write. Once the queue is half full only
+    sample_rate of new records are kept, and when it is full they are dropped; both are
+    counted (in stats() and, given metrics, in bedte_query_log_dropped_total). The file
+    is rotated to <path>.<UTC time> when it reaches max_bytes or when a write falls in a
+    later rotate_interval window than the previous one, keeping the newest backups.
+    Gunicorn workers share the file: appends are single O_APPEND writes and rotation
+    happens under an flock.
+    """
+
+    def __init__(self, path, enabled=True, metrics=None, queue_size=10000, batch_size=256,
+                 flush_interval=1.0, sample_rate=0.1, max_bytes=10 * 1024 * 1024,
+                 rotate_interval=24 * 60 * 60, backups=7):
+        self.path = path
+        self.enabled = enabled
+        self.metrics = metrics
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        # Threads don't survive fork: each process gets its own queue and writer
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.sampled_out = 0
+
+    def _start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-log', daemon=True)
+                self._thread.start()
+
+    def log(self, **record):
+        """Queue one record for writing; never blocks."""
+        if not self.enabled:
+            return
+        if self._thread is None or self._pid != os.getpid():
+            self._start()
+        pending = self._queue.qsize()
+        if pending * 2 >= self.queue_size and random.random() >= self.sample_rate:
+            self.sampled_out += 1
+            self._count_drop('sampled')
+            return
+        record.setdefault('ts', round(time.time(), 3))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._count_drop('full')
+
+    def _count_drop(self, reason):
+        if self.metrics is not None:
+            self.metrics.inc('bedte_query_log_dropped_total', reason=reason)
+
+    def _run(self):
+        get = self._queue.get
+        while True:
+            batch = [get()]
+            deadline = time.monotonic() + self.flush_interval
+            # Gather more records until the batch is full or flush_interval has passed
+            while len(batch) < self.batch_size and batch[-1] is not _STOP:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            records = [r for r in batch if r is not _STOP]
+            if records:
+                try:
+                    self._write(records)
+                except (OSError, ValueError):
+                    logger.exception("Could not write %d query log records to %s", len(records), self.path)
+            if stop:
+                return
+
+    def _write(self, records):
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode('utf-8')
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if self._should_rotate(os.fstat(fd), len(data)):
+                fd = self._rotate(fd, len(data))
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+        self.written += len(records)
+
+    def _should_rotate(self, st, incoming):
+        if not st.st_size:
+            return False
+        if self.max_bytes and st.st_size + incoming > self.max_bytes:
+            return True
+        if self.rotate_interval:
+            return int(st.st_mtime // self.rotate_interval) != int(time.time() // self.rotate_interval)
+        return False
+
+    def _rotate(self, fd, incoming):
+        """Rename the current file away and return a descriptor for a fresh one."""
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            st = os.fstat(fd)
+            try:
+                current = os.stat(self.path).st_ino == st.st_ino
+            except FileNotFoundError:
+                current = False
+            # Another worker may have rotated it between our open() and the lock
+            if current and self._should_rotate(st, incoming):
+                stamp = time.strftime('%Y%m%d-%H%M%S', time.gmtime(st.st_mtime))
+                target = f"{self.path}.{stamp}"
+                suffix = 1
+                while os.path.exists(target):
+                    target = f"{self.path}.{stamp}-{suffix:03d}"
+                    suffix += 1
+                os.rename(self.path, target)
+                self._prune()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+        return os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _prune(self):
+        for path in rotated_files(self.path)[:-self.backups or None]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self, timeout=5.0):
+        """Write everything queued so far and stop the writer (at exit / worker shutdown)."""
+        thread = self._thread
+        if thread is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            # The writer is stuck (e.g. on a hung disk); don't hang the worker's exit on it
+            logger.warning("Query log writer is not draining; %d records to %s are lost",
+                           self._queue.qsize(), self.path)
+            return
+        thread.join(max(0.0, deadline - time.monotonic()))
+        self._thread = None
+
+    def stats(self):
+        """Counts for this process (see /query-log/stats)."""
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'sampled_out': self.sampled_out
+        }
+
+
+def rotated_files(path):
+    """Rotated copies of the log at path, oldest first."""
+    return sorted(glob.glob(glob.escape(path) + '.[0-9]*'))
+
+
+def read_records(paths):
+    """Yield every record in the given JSON-lines files, skipping lines that don't parse."""
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            continue
+
+
+def top_unmatched(records, n=20, branches=('none',)):
+    """Most frequent normalized inputs among records whose match branch is in branches.
+    Returns: list of (count, normalized input, most common raw query, most common matched phrase or None)
+    """
+    counts = Counter()
+    queries = {}
+    matches = {}
+    for record in records:
+        if record.get('branch') not in branches:
+            continue
+        key = record.get('normalized') or ''
+        if not key:
+            continue
+        counts[key] += 1
+        queries.setdefault(key, Counter())[record.get('query')] += 1
+        matches.setdefault(key, Counter())[record.get('matched_phrase')] += 1
+    return [
+        (count, key, queries[key].most_common(1)[0][0], matches[key].most_common(1)[0][0])
+        for key, count in counts.most_common(n)
+    ]
+
+
+if __name__ == '__main__':
+    # Which inputs found nothing? python query_log.py [--top 50] [--fuzzy] [log files...]
+    import argparse
+    parser = argparse.ArgumentParser(description='Top unmatched inputs in the query log')
+    parser.add_argument('paths', nargs='*', help='log files (default: the configured log and its rotations)')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--fuzzy', action='store_true', help='also count inputs that only matched fuzzily')
+    args = parser.parse_args()
+    paths = args.paths
+    if not paths:
+        from bot import Bot
+        bot = Bot()
+        bot.query_log.enabled = False
+        bot.metrics.close()
+        paths = rotated_files(bot.query_log.path) + [bot.query_log.path]
+    branches = ('none', 'fuzzy') if args.fuzzy else ('none',)
+    for count, key, query, matched in top_unmatched(read_records(paths), args.top, branches):
+        guess = f"  (matched {matched})" if matched else ""
+        print(f"{count:6d}  {key}  e.g. {query!r}{guess}")
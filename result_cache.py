@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """Size-bounded, thread-safe LRU cache with hit/miss/eviction counters.
+
+    Entries belong to a version (e.g. of the lexicon they were computed from);
+    set_version() with a different version drops them all. get() and put() given the
+    version the caller is working with ignore the cache when it has moved on, so a result
+    computed just before a version change is never stored under the new one.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def set_version(self, version):
+        """Clear the cache if version differs from the one its entries were built for."""
+        if version == self.version:
+            return
+        with self._lock:
+            if version != self.version:
+                if self._data:
+                    self.invalidations += 1
+                self._data.clear()
+                self.version = version
+
+    def get(self, key, default=None, version=None):
+        with self._lock:
+            if version is not None and version != self.version:
+                self.misses += 1
+                return default
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version=None):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
@@ -0,0 +1,86 @@
+// Offline support for index.html: keeps the page, the /lexicon bundle and every audio
+// clip it references in Cache Storage, so exact matches work without a connection.
+// /chat is never cached; fuzzy and unknown input still needs the server.
+const CACHE = 'bedte-v1';
+const SHELL = ['/', '/lexicon'];
+// Optimized recordings are named by content hash (see optimize_audio.py) and never change
+const HASHED_AUDIO = /\.[0-9a-f]{10}\.wav$/;
+
+// Store the current bundle and the clips it points to, dropping clips it no longer uses
+async function cacheLexicon(cache, response) {
+    const bundle = await response.clone().json();
+    await cache.put('/lexicon', response);
+    const wanted = new Set();
+    Object.values(bundle.entries).forEach(entry => {
+        if (entry[2]) wanted.add(new URL(entry[2], self.location.origin).href);
+    });
+    const cached = new Set((await cache.keys()).map(request => request.url));
+    for (const url of cached) {
+        if (url.includes('/audio/') && !wanted.has(url)) await cache.delete(url);
+    }
+    await Promise.all([...wanted].filter(url => !cached.has(url)).map(url =>
+        fetch(url).then(r => r.ok ? cache.put(url, r) : null).catch(() => null)
+    ));
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil((async () => {
+        const cache = await caches.open(CACHE);
+        await cache.add('/');
+        const response = await fetch('/lexicon');
+        if (response.ok) await cacheLexicon(cache, response);
+        await self.skipWaiting();
+    })());
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        const names = await caches.keys();
+        await Promise.all(names.filter(name => name !== CACHE).map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+// Answer from the cache straight away and refresh it in the background
+async function staleWhileRevalidate(event, path) {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match(path);
+    const refresh = fetch(path, { cache: 'no-cache' }).then(async response => {
+        if (response.ok) {
+            if (path === '/lexicon') await cacheLexicon(cache, response.clone());
+            else await cache.put(path, response.clone());
+        }
+        return response;
+    });
+    if (cached) {
+        event.waitUntil(refresh.catch(() => null));
+        return cached;
+    }
+    return refresh;
+}
+
+// Clips are cached whole: media elements send Range requests, whose 206 replies can't be stored
+async function audio(event, url) {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match(url);
+    if (cached && HASHED_AUDIO.test(url.pathname)) return cached;
+    try {
+        const response = await fetch(url.href);
+        if (response.ok) await cache.put(url.href, response.clone());
+        return response;
+    } catch (error) {
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) return;
+    if (SHELL.includes(url.pathname)) {
+        event.respondWith(staleWhileRevalidate(event, url.pathname));
+    } else if (url.pathname.startsWith('/audio/') && url.pathname !== '/audio/manifest') {
+        event.respondWith(audio(event, url));
+    }
+});